@@ -50,24 +50,23 @@ processed_dir = paths.PROCESSED_DIR / "processed_book.json"
 extractor = LlamaExtract(api_key = settings.LLAMA_API_KEY)
 
 # Get or create the agent
-try:
-    print("getting the extracting agent...", sep="\n")
-    agent = extractor.get_agent(name=my_agent)
-except:
-    print("Creating the agent...", sep="\n")
-    #Extraction agent config
-    config = ExtractConfig(
-    extraction_mode = ExtractMode.BALANCED,
-    extraction_target= ExtractTarget.PER_DOC,
-    system_prompt=system_prompts,
-    chunk_mode=ChunkMode.SECTION)
-
-    agent = extractor.create_agent(name=my_agent,
-                                   data_schema=schema,
-                                   config=config)
-
-# list of chapters
-chapter_files = list_chapters(paths.PRE_PROCESSED_DIR)
+def get_agent():
+    try:
+        print("getting the extracting agent...", sep="\n")
+        return extractor.get_agent(name=my_agent)
+    except:
+        print("Creating the agent...", sep="\n")
+        #Extraction agent config
+        config = ExtractConfig(
+        extraction_mode = ExtractMode.BALANCED,
+        extraction_target= ExtractTarget.PER_DOC,
+        system_prompt=system_prompts,
+        chunk_mode=ChunkMode.SECTION)
+
+        return extractor.create_agent(name=my_agent,
+                                      data_schema=schema,
+                                      config=config)
+
 # Wait until all jobs finish
 async def wait_for_jobs(agent, jobs, interval=5):
 
@@ -94,33 +93,39 @@ async def wait_for_jobs(agent, jobs, interval=5):
 
     print("All jobs done")
 
+async def extract_chapters(agent, batch_files, batch_number=1):
+    # Queue extraction files for the batch and return (file, record) pairs, records in processed_book.json format
+    jobs = await agent.queue_extraction(batch_files)
+    print(f"{len(jobs)} jobs sent to extraction for this batch")
+    
+    await wait_for_jobs(agent, jobs)
+
+    #Get the result of extraction, jobs are queued in the same order as the files
+    batch_data = []
+    for file, job in zip(batch_files, jobs):
+        result = agent.get_extraction_run_for_job(job.id)
+        if result and hasattr(result, 'data') and result.data:
+            chapter_id = result.data.get("chapter_id", f"unknown_chapter_batch_{batch_number}") 
+            batch_data.append((file, {
+                "Chapter": chapter_id,
+                "data": result.data
+            }))
+        else:
+            print(f"Warning: Received an empty or invalid result for {file} in batch {batch_number}")
+    return batch_data
+
 async def main():
     batch_size = 10 
-    all_final_data = []
+    agent = get_agent()
+    # list of chapters
+    chapter_files = list_chapters(paths.PRE_PROCESSED_DIR)
 
     for i in range(0, len(chapter_files), batch_size):
         batch_files = chapter_files[i:i + batch_size]
         batch_number = (i // batch_size) + 1
         print(f"--- Processing Batch {batch_number} ---",sep = "\n")
 
-        # Queue extraction files for the current batch
-        jobs = await agent.queue_extraction(batch_files)
-        print(f"{len(jobs)} jobs sent to extraction for this batch")
-        
-        await wait_for_jobs(agent, jobs)
-
-        results = [agent.get_extraction_run_for_job(job.id) for job in jobs]
-        #Get the result of extraction and save
-        batch_data = []
-        for result in results:
-            if result and hasattr(result, 'data') and result.data:
-                chapter_id = result.data.get("chapter_id", f"unknown_chapter_batch_{batch_number}") 
-                batch_data.append({
-                    "Chapter": chapter_id,
-                    "data": result.data
-                })
-            else:
-                print(f"Warning: Received an empty or invalid result for a job in batch {batch_number}")
+        batch_data = [record for _, record in await extract_chapters(agent, batch_files, batch_number)]
 
         # If there's new data, read the existing file, append, and write it back
         if batch_data:
@@ -147,4 +152,5 @@ async def main():
         await asyncio.sleep(5)
     print("Finish: All batches processed and data saved.",sep = "\n")
 
-asyncio.run(main())
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -16,6 +16,14 @@ SRC_DIR = paths.CREW_DIR
 AGENTS_PATH = paths.AGENT_DIR
 TASKS_PATH = paths.TASKS_DIR
 
+# Template tools first so the agent prefers them over free-form Cypher
+GRAPH_TOOL_NAMES = (
+    "character_pair_interactions",
+    "character_interactions_by_chapter",
+    "interactions_by_type_or_theme",
+    "run_cypher",
+)
+
 def _load_task_agent_mapping(path: Path) -> Dict[str, str]:
     """Return an ordered mapping task_name -> agent_name from the YAML config."""
     with path.open("r", encoding="utf-8") as f:
@@ -51,7 +59,8 @@ class PrideAndPrejudiceCrew:
         with MCPServerAdapter(server_params) as tools:
             tool_list = list(tools)
 
-            graph_tools = [t for t in tool_list if t.name == "run_cypher"]
+            tools_by_name = {t.name: t for t in tool_list}
+            graph_tools = [tools_by_name[name] for name in GRAPH_TOOL_NAMES if name in tools_by_name]
             semantic_tools = [t for t in tool_list if t.name == "semantic_pinecone_search"]
 
             # Attach tools based on which tasks an agent owns
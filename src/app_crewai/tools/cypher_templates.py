@@ -0,0 +1,76 @@
+"""Parameterized Cypher templates backing the typed graph MCP tools.
+
+Character names and interaction types are matched on the lowercase
+`name_key` / `interaction_type_key` copies written by the loader, through
+text indexes, and chapter ranges through the `chapter_number` range index
+(see `Neo4jLoader.create_indexes`). Characters are resolved first and only
+their edges are expanded. Themes are a list and can't be indexed, so the
+theme template narrows by chapter range only. Pass search values through
+`search_key` so they match the stored keys.
+"""
+
+
+def search_key(text):
+    #Same normalization as the stored keys (toLower(trim(...)) in the loader)
+    return text.strip().lower() if text else text
+
+INTERACTION_FIELDS = """
+    a.name AS character_a,
+    b.name AS character_b,
+    r.chapter AS chapter,
+    r.chapter_number AS chapter_number,
+    r.setting AS setting,
+    r.interaction_type AS interaction_type,
+    r.sentiment_A_to_B AS sentiment_A_to_B,
+    r.sentiment_B_to_A AS sentiment_B_to_A,
+    r.emotional_tone AS emotional_tone,
+    r.power_dynamics AS power_dynamics,
+    r.themes AS themes,
+    r.plot_development AS plot_development,
+    r.summary AS summary
+"""
+
+# Interactions between two characters, in either direction
+CHARACTER_PAIR_INTERACTIONS = f"""
+MATCH (x:Character) WHERE x.name_key CONTAINS $character_a
+MATCH (y:Character) WHERE y.name_key CONTAINS $character_b
+MATCH (x)-[r:INTERACTS_IN]-(y)
+WITH DISTINCT r
+WITH startNode(r) AS a, r, endNode(r) AS b
+RETURN {INTERACTION_FIELDS}
+ORDER BY r.chapter_number
+LIMIT $limit
+"""
+
+# Every interaction a character takes part in within a chapter range
+CHARACTER_CHAPTER_INTERACTIONS = f"""
+MATCH (x:Character) WHERE x.name_key CONTAINS $character
+MATCH (x)-[r:INTERACTS_IN]-(:Character)
+WHERE r.chapter_number >= $chapter_from AND r.chapter_number <= $chapter_to
+WITH DISTINCT r
+WITH startNode(r) AS a, r, endNode(r) AS b
+RETURN {INTERACTION_FIELDS}
+ORDER BY r.chapter_number
+LIMIT $limit
+"""
+
+# Interactions by interaction type (substring of the lowercase key, types are free text), optionally narrowed by theme and chapter range
+INTERACTIONS_BY_TYPE = f"""
+MATCH (a:Character)-[r:INTERACTS_IN]->(b:Character)
+WHERE r.interaction_type_key CONTAINS $interaction_type
+  AND r.chapter_number >= $chapter_from AND r.chapter_number <= $chapter_to
+  AND ($theme IS NULL OR any(t IN r.themes WHERE toLower(t) CONTAINS $theme))
+RETURN {INTERACTION_FIELDS}
+ORDER BY r.chapter_number
+LIMIT $limit
+"""
+
+# Interactions by theme (chapter range seek, themes is a list and can't be indexed)
+INTERACTIONS_BY_THEME = f"""
+MATCH (a:Character)-[r:INTERACTS_IN]->(b:Character)
+WHERE r.chapter_number >= $chapter_from AND r.chapter_number <= $chapter_to
+  AND any(t IN r.themes WHERE toLower(t) CONTAINS $theme)
+RETURN {INTERACTION_FIELDS}
+ORDER BY r.chapter_number
+LIMIT $limit
+"""
@@ -2,28 +2,25 @@ import os
 from typing import Any, Dict, List, Optional
 
 from mcp.server.fastmcp import FastMCP
-from neo4j import GraphDatabase
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from utils.config import settings
-from pinecone import Pinecone, ServerlessSpec
+from utils.clients import get_pinecone_index, pinecone_pool, pool_metrics, read_cypher
+from utils.embedding_reduction import EmbeddingReducer
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from app_crewai.tools import cypher_templates
 
 
-URI = settings.NEO4J_URI
-USER = settings.NEO4J_USER
-PASSWORD = settings.NEO4J_PASSWORD
-PINECONE_API_KEY = settings.PINECONE_API_KEY
 PINECONE_INDEX_NAME = settings.PINECONE_INDEX_NAME
 GOOGLE_API_KEY = settings.GOOGLE_API_KEY
 
 mcp = FastMCP("mcp-server-pride")
-driver = GraphDatabase.driver(URI, auth=(USER, PASSWORD))
-
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX_NAME)
+# Shared clients: pooled connections, Neo4j queries go through read_cypher (see utils/clients.py)
+index = get_pinecone_index(PINECONE_INDEX_NAME)
 
 # Embedding model
-embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001", google_api_key=settings.GOOGLE_API_KEY)
+embeddings = GoogleGenerativeAIEmbeddings(model=settings.EMBEDDING_MODEL, google_api_key=settings.GOOGLE_API_KEY)
+# Query vectors must be reduced the same way as the indexed scenes
+reducer = EmbeddingReducer.from_settings()
 
 class CypherRequest(BaseModel):
     query: str
@@ -37,14 +34,79 @@ class SemanticSearchRequest(BaseModel):
     query: str
     top_k: int = 5
 
+class CharacterPairRequest(BaseModel):
+    character_a: str
+    character_b: str
+    limit: int = Field(default=20, ge=1, le=100)
+
+class CharacterChapterRangeRequest(BaseModel):
+    character: str
+    chapter_from: int = Field(default=1, ge=1)
+    chapter_to: int = Field(default=61, ge=1)
+    limit: int = Field(default=20, ge=1, le=100)
+
+    @model_validator(mode="after")
+    def check_range(self):
+        if self.chapter_from > self.chapter_to:
+            raise ValueError("chapter_from must be <= chapter_to")
+        return self
+
+class InteractionFilterRequest(BaseModel):
+    interaction_type: Optional[str] = None
+    theme: Optional[str] = None
+    chapter_from: int = Field(default=1, ge=1)
+    chapter_to: int = Field(default=61, ge=1)
+    limit: int = Field(default=20, ge=1, le=100)
+
+    @model_validator(mode="after")
+    def check_filters(self):
+        if not self.interaction_type and not self.theme:
+            raise ValueError("interaction_type or theme is required")
+        if self.chapter_from > self.chapter_to:
+            raise ValueError("chapter_from must be <= chapter_to")
+        return self
+
+def _template_params(body, *search_fields):
+    #Template parameters, with the search fields normalized like the stored lowercase keys
+    params = body.model_dump()
+    for field in search_fields:
+        params[field] = cypher_templates.search_key(params[field])
+    return params
+
 @mcp.tool()
 def run_cypher(body:CypherRequest) -> List[Dict[str,Any]]:
     """
-    Executes a cypher query to read graph nodes and relationship
+    Executes a cypher query to read graph nodes and relationship (read-only, writes are rejected)
+    """
+    return read_cypher(body.query, body.params)
+
+@mcp.tool()
+def character_pair_interactions(body:CharacterPairRequest) -> List[Dict[str,Any]]:
+    """
+    Returns the interactions between two characters (either direction), ordered by chapter.
+    Names are matched case-insensitively by substring, e.g. "Elizabeth" and "Darcy".
+    """
+    return read_cypher(
+        cypher_templates.CHARACTER_PAIR_INTERACTIONS, _template_params(body, "character_a", "character_b")
+    )
+
+@mcp.tool()
+def character_interactions_by_chapter(body:CharacterChapterRangeRequest) -> List[Dict[str,Any]]:
+    """
+    Returns every interaction of a character between chapter_from and chapter_to (inclusive, 1-61).
+    """
+    return read_cypher(cypher_templates.CHARACTER_CHAPTER_INTERACTIONS, _template_params(body, "character"))
+
+@mcp.tool()
+def interactions_by_type_or_theme(body:InteractionFilterRequest) -> List[Dict[str,Any]]:
+    """
+    Returns interactions whose interaction_type contains the given text (e.g. "proposal") and/or whose
+    themes contain the given theme, optionally within a chapter range. Both matches are case-insensitive.
     """
-    with driver.session() as session:
-        result = session.run(body.query, **(body.params or {}))
-        return [record.data() for record in result]
+    params = _template_params(body, "interaction_type", "theme")
+    if body.interaction_type:
+        return read_cypher(cypher_templates.INTERACTIONS_BY_TYPE, params)
+    return read_cypher(cypher_templates.INTERACTIONS_BY_THEME, params)
 
 @mcp.tool()
 def semantic_pinecone_search(body:SemanticSearchRequest) -> List[Dict[str,Any]]:
@@ -52,11 +114,13 @@ def semantic_pinecone_search(body:SemanticSearchRequest) -> List[Dict[str,Any]]:
     Performs semantic search over the Pinecone index populated
     with Pride and Prejudice scene summaries.
     """
-    query_vector = embeddings.embed_query(body.query)
-    res = index.query(
+    query_vector = reducer.transform_one(embeddings.embed_query(body.query))
+    res = pinecone_pool.call(
+        index.query,
         vector=query_vector,
         top_k=body.top_k,
         include_metadata=True,
+        _request_timeout=settings.PINECONE_REQUEST_TIMEOUT,
     )
     matches = res.get("matches", [])
     return [
@@ -68,5 +132,13 @@ def semantic_pinecone_search(body:SemanticSearchRequest) -> List[Dict[str,Any]]:
         for m in matches
     ]
 
+@mcp.tool()
+def backend_pool_metrics() -> Dict[str,Any]:
+    """
+    Returns connection pool metrics for Neo4j and Pinecone
+    (calls, in-use and max in-use slots, wait time, retries, failures).
+    """
+    return pool_metrics()
+
 if __name__ == "__main__":
    mcp.run(transport='stdio')
\ No newline at end of file
@@ -0,0 +1,147 @@
+from utils.config import settings, paths
+from utils.embedding_reduction import (
+    EmbeddingReducer, _normalize, bytes_per_vector, dequantize_int8, quantize_binary, quantize_int8, unpack_binary,
+)
+from vector_db_loader import (
+    embed_documents, load_all_extractions, load_embedding_cache, prepare_documents_for_embedding, save_embedding_cache,
+)
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+import numpy as np
+
+# Reduced widths to compare against the full 3072-d baseline
+MATRYOSHKA_DIMS = [1536, 768, 256, 128]
+PCA_DIMS = [48, 32, 16]
+QUANTIZATIONS = ["float32", "int8", "binary"]
+TOP_K = 5
+# PCA corpus overlap is scored out-of-sample: the projection is fitted without the query fold
+PCA_FOLDS = 5
+
+SAMPLE_QUESTIONS = [
+    "How does Elizabeth Bennet's relationship with Mr. Darcy evolve over the novel?",
+    "In which scenes does Lady Catherine influence the power dynamics between characters?",
+    "Show key scenes where irony is used to criticize social norms.",
+    "Mrs. Bennet's schemes to marry off her daughters",
+    "Lydia elopes with Wickham",
+]
+
+#Functions
+def load_full_embeddings():
+    #Use the vectors cached by vector_db_loader, embedding the corpus only if the cache is missing
+    _, vectors = load_embedding_cache()
+    if vectors is not None:
+        print(f"Loaded cached embeddings from {paths.EMBEDDINGS_CACHE_DIR}")
+        return vectors
+    print("No embedding cache found, embedding the corpus...")
+    documents = prepare_documents_for_embedding(load_all_extractions(paths.PROCESSED_F_DIR, True))
+    vectors = embed_documents(documents, _embedding_model())
+    save_embedding_cache(documents, vectors)
+    return vectors
+
+def _embedding_model():
+    return GoogleGenerativeAIEmbeddings(model=settings.EMBEDDING_MODEL, google_api_key=settings.GOOGLE_API_KEY)
+
+def top_k(queries, corpus, k, exclude=None):
+    #Indices of the k best cosine matches per query, optionally skipping one corpus row per query (the query itself)
+    scores = _normalize(queries) @ _normalize(corpus).T
+    if exclude is not None:
+        scores[np.arange(len(exclude)), exclude] = -np.inf
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def overlap_at_k(baseline, candidate):
+    #Mean fraction of the baseline top-k that the candidate also returns
+    k = baseline.shape[1]
+    return float(np.mean([len(set(b) & set(c)) / k for b, c in zip(baseline, candidate)]))
+
+def quantized(vectors, quantization):
+    #Round-trip through the quantized representation to score the way a quantized index would
+    if quantization == "int8":
+        return dequantize_int8(*quantize_int8(vectors))
+    if quantization == "binary":
+        return unpack_binary(quantize_binary(vectors), vectors.shape[1])
+    return vectors
+
+def pca_corpus_candidates(corpus, dim, quantization, k, folds=PCA_FOLDS):
+    #Corpus-as-queries top-k for PCA, fitting the projection on the other folds so it never saw the queries
+    n = corpus.shape[0]
+    candidates = np.empty((n, k), dtype=int)
+    for fold in np.array_split(np.arange(n), folds):
+        reducer = EmbeddingReducer("pca", dim).fit(np.delete(corpus, fold, axis=0))
+        reduced = reducer.transform(corpus)
+        candidates[fold] = top_k(reduced[fold], quantized(reduced, quantization), k, exclude=fold)
+    return candidates
+
+def evaluate(corpus, questions, k=TOP_K):
+    #Returns one row per (method, dim, quantization) with top-k overlap against full-precision 3072-d search
+    n = corpus.shape[0]
+    leave_one_out = n > k
+    baselines = [("corpus", top_k(corpus, corpus, k, exclude=np.arange(n)))] if leave_one_out else []
+    if questions is not None:
+        baselines.append(("questions", top_k(questions, corpus, k)))
+
+    configs = [("none", settings.EMBEDDING_FULL_DIM)]
+    configs += [("matryoshka", dim) for dim in MATRYOSHKA_DIMS]
+    configs += [("pca", dim) for dim in PCA_DIMS]
+
+    rows = []
+    for method, dim in configs:
+        reducer = EmbeddingReducer(method, dim)
+        try:
+            if method == "pca" and leave_one_out:
+                # each fold is fitted without its queries, so it must fit on that smaller corpus too
+                reducer.check_corpus_size(n - int(np.ceil(n / PCA_FOLDS)))
+            reduced_corpus = reducer.fit_transform(corpus)
+        except ValueError as e:
+            print(f"Skipping {method}-{dim}: {e}")
+            continue
+        reduced_questions = reducer.transform(questions) if questions is not None else None
+
+        for quantization in QUANTIZATIONS:
+            stored = quantized(reduced_corpus, quantization)
+            row = {
+                "method": method,
+                "dim": dim,
+                "quantization": quantization,
+                "bytes_per_vector": bytes_per_vector(dim, quantization),
+            }
+            for name, baseline in baselines:
+                if name == "corpus" and method == "pca":
+                    candidate = pca_corpus_candidates(corpus, dim, quantization, k)
+                elif name == "corpus":
+                    candidate = top_k(reduced_corpus, stored, k, exclude=np.arange(n))
+                else:
+                    # queries stay float, only the stored vectors are quantized
+                    candidate = top_k(reduced_questions, stored, k)
+                row[f"overlap_{name}"] = overlap_at_k(baseline, candidate)
+            rows.append(row)
+    return rows
+
+def print_report(rows, n_vectors, k=TOP_K):
+    full_bytes = bytes_per_vector(settings.EMBEDDING_FULL_DIM)
+    overlap_cols = [c for c in rows[0] if c.startswith("overlap_")]
+    header = f"{'method':<11}{'dim':>6}  {'quant':<8}{'bytes/vec':>10}{'size %':>8}{'index KB':>10}"
+    header += "".join(f"{c.replace('overlap_', 'top' + str(k) + ' ' ):>16}" for c in overlap_cols)
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        line = f"{row['method']:<11}{row['dim']:>6}  {row['quantization']:<8}{row['bytes_per_vector']:>10}"
+        line += f"{100 * row['bytes_per_vector'] / full_bytes:>7.1f}%{row['bytes_per_vector'] * n_vectors / 1024:>10.1f}"
+        line += "".join(f"{row[c]:>16.3f}" for c in overlap_cols)
+        print(line)
+
+def main():
+    corpus = load_full_embeddings()
+    print(f"{corpus.shape[0]} scene vectors, {corpus.shape[1]} dimensions")
+
+    questions = None
+    if settings.GOOGLE_API_KEY:
+        embeddings = _embedding_model()
+        questions = np.asarray([embeddings.embed_query(q) for q in SAMPLE_QUESTIONS], dtype=np.float32)
+    else:
+        print("GEMINI_API_KEY not set, evaluating with corpus-as-queries only")
+
+    rows = evaluate(corpus, questions)
+    print(f"\nTop-{TOP_K} overlap against full-precision {settings.EMBEDDING_FULL_DIM}-d search (1.0 = identical results)\n")
+    print_report(rows, corpus.shape[0])
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,13 @@
 import os
 import json
 import re
-from neo4j import GraphDatabase
 from utils.config import paths, settings
+from utils.clients import create_neo4j_driver, pool_metrics, run_neo4j_transaction
+from utils.chapters import chapter_number
 
 class Neo4jLoader:
     def __init__(self, uri, user, password):
-        self.driver = GraphDatabase.driver(uri,auth=(user,password))
+        self.driver = create_neo4j_driver(uri, user, password)
         print("Neo4j connection established")
     #Close the connection
     def close(self):
@@ -18,19 +19,70 @@ class Neo4jLoader:
         print(f"Executing query: {query}")
         print(f"With parameters: {json.dumps(parameters, indent=2)}")
         tx.run(query, parameters)
+
+    def _write(self, query, parameters={}):
+        #each write is its own managed transaction, retried by the driver
+        run_neo4j_transaction(self.driver, self._execute_query, query, parameters, write=True)
     
     def create_constraints(self):
         #create a constraint to ensure unique characters
         query = "CREATE CONSTRAINT IF NOT EXISTS FOR (c:Character) REQUIRE c.name IS UNIQUE"
-        with self.driver.session() as session:
-            # Passamos a query sem parâmetros
-            session.execute_write(self._execute_query, query)
+        self._write(query)
+
+    def create_indexes(self):
+        #create the indexes used by the MCP query templates (chapter lookups and ranges, substring search on the
+        #lowercase name_key / interaction_type_key copies, since toLower(x) CONTAINS ... can't use an index)
+        queries = [
+            "CREATE INDEX interacts_in_chapter IF NOT EXISTS FOR ()-[r:INTERACTS_IN]-() ON (r.chapter)",
+            "CREATE INDEX interacts_in_chapter_number IF NOT EXISTS FOR ()-[r:INTERACTS_IN]-() ON (r.chapter_number)",
+            "CREATE TEXT INDEX character_name_key IF NOT EXISTS FOR (c:Character) ON (c.name_key)",
+            "CREATE TEXT INDEX interacts_in_interaction_type_key IF NOT EXISTS "
+            "FOR ()-[r:INTERACTS_IN]-() ON (r.interaction_type_key)",
+        ]
+        for query in queries:
+            self._write(query)
+        self.backfill_chapter_numbers()
+        self.backfill_search_keys()
+
+    def backfill_chapter_numbers(self):
+        #edges loaded before chapter_number existed only have the chapter id ("Chapter XIV"), derive the number from it
+        def _backfill(tx):
+            result = tx.run(
+                "MATCH ()-[r:INTERACTS_IN]->() WHERE r.chapter_number IS NULL RETURN DISTINCT r.chapter AS chapter"
+            )
+            chapters = [record["chapter"] for record in result]
+            for chapter in chapters:
+                number = chapter_number(chapter)
+                if number is None:
+                    print(f"Warning: can't derive a chapter number from '{chapter}'")
+                    continue
+                tx.run(
+                    "MATCH ()-[r:INTERACTS_IN {chapter: $chapter}]->() WHERE r.chapter_number IS NULL "
+                    "SET r.chapter_number = $number",
+                    chapter=chapter, number=number,
+                )
+            return len(chapters)
+
+        count = run_neo4j_transaction(self.driver, _backfill, write=True)
+        if count:
+            print(f"chapter_number backfilled for {count} chapters")
     
+    def backfill_search_keys(self):
+        #nodes and edges loaded before the lowercase search keys existed
+        queries = [
+            "MATCH (c:Character) WHERE c.name_key IS NULL SET c.name_key = toLower(trim(c.name))",
+            "MATCH ()-[r:INTERACTS_IN]->() WHERE r.interaction_type_key IS NULL AND r.interaction_type IS NOT NULL "
+            "SET r.interaction_type_key = toLower(trim(r.interaction_type))",
+        ]
+        for query in queries:
+            self._write(query)
+
     def load_character(self, character_info, chapter_id):
     
         query = """
         MERGE (c:Character {name: $name})
         ON CREATE SET
+            c.name_key = toLower(trim($name)),
             c.description = $description,
             c.roles = [$role_in_chapter]
         ON MATCH SET
@@ -43,16 +95,18 @@ class Neo4jLoader:
             # We store the role with context from the chapter
             "role_in_chapter": f"{character_info.get('role', 'Unknown role')} (in {chapter_id})"
         }
-        with self.driver.session() as session:
-            session.execute_write(self._execute_query, query, parameters)
+        self._write(query, parameters)
 
     def load_interaction(self, pairwise_rel, scene_info):
         
         query = """
         MERGE (char_a:Character {name: $char_a_name})
+        ON CREATE SET char_a.name_key = toLower(trim($char_a_name))
         MERGE (char_b:Character {name: $char_b_name})
+        ON CREATE SET char_b.name_key = toLower(trim($char_b_name))
         CREATE (char_a)-[r:INTERACTS_IN {
-            chapter: $chapter, setting: $setting, interaction_type: $interaction_type,
+            chapter: $chapter, chapter_number: $chapter_number, setting: $setting, interaction_type: $interaction_type,
+            interaction_type_key: toLower(trim($interaction_type)),
             sentiment_A_to_B: $sentiment_a_b, sentiment_B_to_A: $sentiment_b_a,
             summary: $summary, emotional_tone: $emotional_tone, power_dynamics: $power_dynamics,
             themes: $themes, plot_development: $plot_development
@@ -62,6 +116,7 @@ class Neo4jLoader:
             "char_a_name": pairwise_rel.get("character_name_a"),
             "char_b_name": pairwise_rel.get("character_name_b"),
             "chapter": scene_info.get("chapter_id", "Unknown Chapter"),
+            "chapter_number": chapter_number(scene_info.get("chapter_id")),
             "setting": scene_info.get("setting", "Unknown Setting"),
             "interaction_type": pairwise_rel.get("interaction_type", "Unknown Interaction"),
             "sentiment_a_b": pairwise_rel.get("sentiment_A_to_B", "Unknown"),
@@ -72,34 +127,30 @@ class Neo4jLoader:
             "themes": scene_info.get("themes", []),
             "plot_development": scene_info.get("plot_development", "N/A")
         }
-        with self.driver.session() as session:
-            session.execute_write(self._execute_query, query, parameters)
-
-def load_all_extractions(filepath, is_json):
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f) if is_json else f.read()
-    except FileNotFoundError:
-        print(f"Error: file not found. Path: {filepath}")
-        return None
-    except json.JSONDecodeError:
-        print(f"Error: JSON decode: {filepath}")
-        return None
+        self._write(query, parameters)
 
-def main():
-    #Credentials
-    URI = settings.NEO4J_URI
-    USER = settings.NEO4J_USER
-    PASSWORD =  settings.NEO4J_PASSWORD
-
-    loader = Neo4jLoader(URI, USER, PASSWORD)
-    loader.create_constraints()
+    def delete_chapter(self, chapter_id):
+        #remove a chapter's interactions, roles and orphaned characters so it can be reloaded without duplicates
+        queries = [
+            ("MATCH ()-[r:INTERACTS_IN {chapter: $chapter}]->() DELETE r", {"chapter": chapter_id}),
+            (
+                "MATCH (c:Character) WHERE any(role IN c.roles WHERE role ENDS WITH $suffix) "
+                "SET c.roles = [role IN c.roles WHERE NOT role ENDS WITH $suffix]",
+                {"suffix": f"(in {chapter_id})"},
+            ),
+            # characters only this chapter knew about would otherwise linger as ghost nodes
+            (
+                "MATCH (c:Character) WHERE coalesce(size(c.roles), 0) = 0 AND NOT (c)--() DELETE c",
+                {},
+            ),
+        ]
+        for query, parameters in queries:
+            self._write(query, parameters)
 
-    chapters = load_all_extractions(paths.PROCESSED_F_DIR, True)
-    
+def load_chapters(loader, chapters):
+    #load characters and interactions for each extracted chapter, returns (character_count, interaction_count)
     character_count = 0
     interaction_count = 0
-    print("Loading characters and interactions to neo4j")
 
     for chapter_data in chapters:
         scene = chapter_data.get("data", {})
@@ -122,10 +173,39 @@ def main():
                     #only load if char a and b were found
                     loader.load_interaction(rel, scene)
                     interaction_count += 1
+
+    return character_count, interaction_count
+
+def load_all_extractions(filepath, is_json):
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f) if is_json else f.read()
+    except FileNotFoundError:
+        print(f"Error: file not found. Path: {filepath}")
+        return None
+    except json.JSONDecodeError:
+        print(f"Error: JSON decode: {filepath}")
+        return None
+
+def main():
+    #Credentials
+    URI = settings.NEO4J_URI
+    USER = settings.NEO4J_USER
+    PASSWORD =  settings.NEO4J_PASSWORD
+
+    loader = Neo4jLoader(URI, USER, PASSWORD)
+    loader.create_constraints()
+    loader.create_indexes()
+
+    chapters = load_all_extractions(paths.PROCESSED_F_DIR, True)
+    
+    print("Loading characters and interactions to neo4j")
+    character_count, interaction_count = load_chapters(loader, chapters)
     
     print(f"Loading complete!")
     print(f"{character_count} character appearances processed (nodes created/updated).")
     print(f"{interaction_count} interactions were added to the graph.")
+    print(f"Neo4j pool metrics: {json.dumps(pool_metrics()['neo4j'])}")
     
     loader.close()
 
@@ -0,0 +1,357 @@
+"""Incremental rebuild of the extraction, Pinecone index and Neo4j graph.
+
+Every chapter file under data/pre_processed is fingerprinted, together with
+the artifacts derived from it at each stage:
+
+- extraction: the record(s) in processed_book.json (stale when the chapter text changes),
+- embedding: the scene vector (stale when the record changes),
+- graph: the chapter's Character roles and INTERACTS_IN edges (stale when the record changes).
+
+Fingerprints of the last successful run are kept in pipeline_manifest.json and
+only the stale stages of the changed chapters are recomputed. A change to the
+embedding settings affects every vector and the index itself, so it is reported
+once and left to a full vector_db_loader run instead of being planned per chapter.
+
+    python src/pipeline.py --dry-run    # print the plan
+    python src/pipeline.py              # run it
+    python src/pipeline.py --baseline   # mark the current artifacts as up to date
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+from pathlib import Path
+
+from utils.config import paths, settings
+from utils.chapters import chapter_number, int_to_roman
+from utils.clients import pool_metrics
+
+STAGES = ("extraction", "embedding", "graph")
+
+# Scene fields graph_db_loader writes to Neo4j
+GRAPH_FIELDS = (
+    "chapter_id", "setting", "characters", "pairwise_relationships",
+    "emotional_tone", "power_dynamics", "themes", "plot_development",
+)
+
+#Fingerprints
+def _hash(payload):
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+def fingerprint_file(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def embedding_fingerprint(records):
+    from vector_db_loader import prepare_documents_for_embedding
+    return _hash(prepare_documents_for_embedding(records))
+
+def embedding_config():
+    return [settings.EMBEDDING_MODEL, settings.EMBEDDING_REDUCTION, settings.EMBEDDING_DIM]
+
+def embedding_config_changed(manifest):
+    #Tracked chapters were embedded with other settings than the current ones
+    return bool(manifest["chapters"]) and manifest.get("embedding_config") != embedding_config()
+
+def graph_fingerprint(records):
+    return _hash([{k: r.get("data", {}).get(k) for k in GRAPH_FIELDS} for r in records])
+
+#Manifest and extraction records
+def load_manifest():
+    try:
+        with open(paths.PIPELINE_MANIFEST_DIR, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"chapters": {}}
+
+def save_manifest(manifest):
+    with open(paths.PIPELINE_MANIFEST_DIR, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=4)
+
+def load_records():
+    try:
+        with open(paths.PROCESSED_F_DIR, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+def save_records(records):
+    with open(paths.PROCESSED_F_DIR, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False, indent=4)
+
+def group_records(records):
+    #chapter number -> extraction records for that chapter
+    grouped = {}
+    for record in records:
+        number = chapter_number(record.get("data", {}).get("chapter_id"))
+        if number is None:
+            print(f"Warning: can't map record '{record.get('Chapter')}' to a chapter file, ignoring it")
+            continue
+        grouped.setdefault(number, []).append(record)
+    return grouped
+
+def merge_records(records, extracted):
+    #Replace the records of every re-extracted chapter in place, append chapters seen for the first time.
+    #Keyed by the chapter file that was sent, not the chapter_id the extraction returned for it
+    new_by_number = {}
+    for path, record in extracted:
+        number = chapter_number(path.stem)
+        returned = record["data"].get("chapter_id")
+        if chapter_number(returned) != number:
+            label = f"Chapter {int_to_roman(number)}"
+            print(f"Warning: extraction of {path.name} came back labelled '{returned}', relabelling it '{label}'")
+            record["Chapter"] = record["data"]["chapter_id"] = label
+        new_by_number.setdefault(number, []).append(record)
+    replaced = set(new_by_number)
+    merged = []
+    for record in records:
+        number = chapter_number(record.get("data", {}).get("chapter_id"))
+        if number not in replaced:
+            merged.append(record)
+        elif number in new_by_number:
+            merged.extend(new_by_number.pop(number))
+    for chapter_records in new_by_number.values():
+        merged.extend(chapter_records)
+    return merged
+
+def _occurrence_keys(ids):
+    #(id, occurrence) pairs: chapter ids repeat in processed_book.json ("Chapter I" twice), so the id alone isn't a key
+    seen = {}
+    keys = []
+    for id_ in ids:
+        keys.append((id_, seen.get(id_, 0)))
+        seen[id_] = seen.get(id_, 0) + 1
+    return keys
+
+def _chapter_ids(records):
+    return sorted({r["data"].get("chapter_id") for r in records if r.get("data", {}).get("chapter_id")})
+
+#Plan
+def list_chapter_files():
+    files = sorted(Path(paths.PRE_PROCESSED_DIR).glob("*.txt"), key=lambda p: chapter_number(p.stem) or 0)
+    return [p for p in files if chapter_number(p.stem) is not None]
+
+def build_plan(manifest, chapter_files, grouped):
+    #Returns ({file name: {stage: reason}}, [removed file names]); chapters with no stale stage are omitted
+    plan = {}
+    # per-chapter re-embedding can't switch settings: the index width changes and PCA needs a refit
+    embed = not embedding_config_changed(manifest)
+    for path in chapter_files:
+        entry = manifest["chapters"].get(path.name, {})
+        records = grouped.get(chapter_number(path.stem), [])
+        steps = {}
+
+        if not records:
+            steps["extraction"] = "no extraction record"
+        elif entry.get("source") != fingerprint_file(path):
+            steps["extraction"] = "chapter text changed" if entry else "not tracked yet"
+
+        if "extraction" in steps:
+            if embed:
+                steps["embedding"] = "after re-extraction"
+            steps["graph"] = "after re-extraction"
+        else:
+            if embed and entry.get("embedding") != embedding_fingerprint(records):
+                steps["embedding"] = "record changed"
+            if entry.get("graph") != graph_fingerprint(records):
+                steps["graph"] = "record changed"
+
+        if steps:
+            plan[path.name] = steps
+
+    present = {path.name for path in chapter_files}
+    removed = [name for name in manifest["chapters"] if name not in present]
+    return plan, removed
+
+def print_plan(plan, removed, n_chapters):
+    if not plan and not removed:
+        print(f"All {n_chapters} chapters are up to date.")
+        return
+    for name, steps in plan.items():
+        print(f"{name:<16}" + " | ".join(f"{stage}: {reason}" for stage, reason in steps.items()))
+    for name in removed:
+        print(f"{name:<16}removed: delete its records, vectors and graph edges")
+    counts = ", ".join(f"{sum(stage in s for s in plan.values())} {stage}" for stage in STAGES)
+    print(f"\nPlan: {counts}, {len(removed)} removed; {n_chapters - len(plan)} chapters up to date.")
+
+#Stages
+def run_extraction(files):
+    from Llama.agent_extraction import extract_chapters, get_agent
+
+    #Returns (chapter file, record) pairs
+    agent = get_agent()
+    batch_size = 10
+    extracted = []
+    for i in range(0, len(files), batch_size):
+        batch = [str(f) for f in files[i:i + batch_size]]
+        pairs = asyncio.run(extract_chapters(agent, batch, i // batch_size + 1))
+        extracted.extend((Path(file), record) for file, record in pairs)
+    return extracted
+
+def run_embedding(records, removed_ids, all_records):
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    from utils.clients import pinecone_pool
+    from utils.embedding_reduction import EmbeddingReducer
+    from vector_db_loader import (
+        embed_documents, get_index, load_embedding_cache, prepare_documents_for_embedding, save_embedding_cache,
+        upsert_documents,
+    )
+    import numpy as np
+
+    # PCA reuses the projection fitted by the last full vector_db_loader run
+    reducer = EmbeddingReducer.from_settings()
+    index = get_index(reducer.dim)
+    if removed_ids:
+        pinecone_pool.call(index.delete, ids=removed_ids, _request_timeout=settings.PINECONE_REQUEST_TIMEOUT)
+    if not records:
+        return
+
+    documents = prepare_documents_for_embedding(records)
+    embeddings = GoogleGenerativeAIEmbeddings(model=settings.EMBEDDING_MODEL, google_api_key=settings.GOOGLE_API_KEY)
+    full_vectors = embed_documents(documents, embeddings)
+
+    upsert_documents(index, documents, reducer.transform(full_vectors))
+
+    # Keep the full-precision cache in sync for embedding_eval and future PCA refits
+    # rows follow processed_book.json order, exactly as a full vector_db_loader run writes them
+    ids, cached = load_embedding_cache()
+    if cached is not None:
+        rows = dict(zip(_occurrence_keys(ids), cached))
+        rows.update(zip(_occurrence_keys([str(doc["id"]) for doc in documents]), full_vectors))
+        all_documents = prepare_documents_for_embedding(all_records)
+        vectors = [rows.get(key) for key in _occurrence_keys([str(doc["id"]) for doc in all_documents])]
+        if any(vec is None for vec in vectors):
+            print("Warning: embedding cache is missing scenes, rerun vector_db_loader to rebuild it")
+        else:
+            save_embedding_cache(all_documents, np.asarray(vectors, dtype=np.float32))
+
+def run_graph(records_by_file, old_ids):
+    from graph_db_loader import Neo4jLoader, load_chapters
+
+    loader = Neo4jLoader(settings.NEO4J_URI, settings.NEO4J_USER, settings.NEO4J_PASSWORD)
+    try:
+        loader.create_constraints()
+        loader.create_indexes()
+        for chapter_id in old_ids:
+            loader.delete_chapter(chapter_id)
+        for records in records_by_file.values():
+            for chapter_id in _chapter_ids(records):
+                loader.delete_chapter(chapter_id)
+            load_chapters(loader, records)
+    finally:
+        loader.close()
+
+#Driver
+def run(plan, removed, manifest, records, chapter_files):
+    files_by_name = {p.name: p for p in chapter_files}
+    embed = not embedding_config_changed(manifest)
+
+    # 1. Extraction
+    to_extract = [files_by_name[name] for name, steps in plan.items() if "extraction" in steps]
+    if to_extract:
+        print(f"--- Extracting {len(to_extract)} chapters ---")
+        extracted = run_extraction(to_extract)
+        records = merge_records(records, extracted)
+        save_records(records)
+        extracted_files = {path.name for path, _ in extracted}
+        for path in to_extract:
+            if path.name not in extracted_files:
+                print(f"Warning: extraction returned nothing for {path.name}, skipping its downstream stages")
+                plan.pop(path.name)
+                continue
+            manifest["chapters"].setdefault(path.name, {})["source"] = fingerprint_file(path)
+        save_manifest(manifest)
+
+    # Records of deleted chapter files would otherwise come back on the next full load
+    if removed:
+        present = {chapter_number(p.stem) for p in chapter_files}
+        gone = {chapter_number(Path(name).stem) for name in removed} - present
+        records = [r for r in records if chapter_number(r.get("data", {}).get("chapter_id")) not in gone]
+        save_records(records)
+
+    grouped = group_records(records)
+    def records_for(name):
+        return grouped.get(chapter_number(Path(name).stem), [])
+    def old_ids(names):
+        return [i for name in names for i in manifest["chapters"].get(name, {}).get("chapter_ids", [])]
+    removed_ids = old_ids(removed)
+
+    # 2. Embedding (skipped entirely when the settings changed, the full vector_db_loader run rebuilds the index)
+    to_embed = [name for name, steps in plan.items() if "embedding" in steps]
+    # vectors are keyed by chapter_id, drop the ones a re-extraction renamed
+    stale_ids = removed_ids + [i for i in old_ids(to_embed) if i not in _chapter_ids(records)]
+    if embed and (to_embed or stale_ids):
+        print(f"--- Re-embedding {len(to_embed)} chapters ---")
+        run_embedding([r for name in to_embed for r in records_for(name)], stale_ids, records)
+        for name in to_embed:
+            manifest["chapters"][name]["embedding"] = embedding_fingerprint(records_for(name))
+        save_manifest(manifest)
+
+    # 3. Graph
+    to_graph = [name for name, steps in plan.items() if "graph" in steps]
+    if to_graph or removed_ids:
+        print(f"--- Reloading {len(to_graph)} chapters into Neo4j ---")
+        run_graph({name: records_for(name) for name in to_graph}, removed_ids + old_ids(to_graph))
+        for name in to_graph:
+            manifest["chapters"][name]["graph"] = graph_fingerprint(records_for(name))
+        save_manifest(manifest)
+
+    for name in plan:
+        manifest["chapters"][name]["chapter_ids"] = _chapter_ids(records_for(name))
+    for name in removed:
+        manifest["chapters"].pop(name)
+    if embed:
+        manifest["embedding_config"] = embedding_config()
+    save_manifest(manifest)
+    print("Pipeline complete!")
+    print(f"Backend pool metrics: {json.dumps(pool_metrics())}")
+
+def baseline(manifest, chapter_files, grouped):
+    #Record the current files and artifacts as up to date without running any stage
+    for path in chapter_files:
+        records = grouped.get(chapter_number(path.stem), [])
+        if not records:
+            print(f"Warning: {path.name} has no extraction record, leaving it untracked")
+            continue
+        manifest["chapters"][path.name] = {
+            "source": fingerprint_file(path),
+            "embedding": embedding_fingerprint(records),
+            "graph": graph_fingerprint(records),
+            "chapter_ids": _chapter_ids(records),
+        }
+    manifest["embedding_config"] = embedding_config()
+    save_manifest(manifest)
+    print(f"Baseline recorded for {len(manifest['chapters'])} chapters.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-extract and re-index only the chapters that changed.")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan without running it")
+    parser.add_argument("--baseline", action="store_true", help="mark the current artifacts as up to date")
+    args = parser.parse_args()
+
+    manifest = load_manifest()
+    records = load_records()
+    chapter_files = list_chapter_files()
+    grouped = group_records(records)
+
+    if args.baseline:
+        baseline(manifest, chapter_files, grouped)
+        return
+
+    plan, removed = build_plan(manifest, chapter_files, grouped)
+    print_plan(plan, removed, len(chapter_files))
+    if embedding_config_changed(manifest):
+        print(
+            f"\nEmbedding settings changed from {manifest.get('embedding_config')} to {embedding_config()}: "
+            "no chapter is re-embedded. After this run, rebuild the vectors with `python src/vector_db_loader.py` "
+            "(into a new PINECONE_INDEX_NAME if the dimension changed), then run `python src/pipeline.py --baseline`."
+        )
+    if not manifest["chapters"]:
+        print("No pipeline manifest yet: use --baseline if the current extraction, index and graph are up to date.")
+    if args.dry_run or (not plan and not removed):
+        return
+    run(plan, removed, manifest, records, chapter_files)
+
+if __name__ == "__main__":
+    main()
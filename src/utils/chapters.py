@@ -0,0 +1,35 @@
+import re
+
+ROMAN_MAP = {'I': 1, 'V': 5, 'X': 10, 'L': 50, 'C': 100, 'D': 500, 'M': 1000}
+ROMAN_SUBTRACTIVE = {**ROMAN_MAP, 'IV': 4, 'IX': 9, 'XL': 40, 'XC': 90, 'CD': 400, 'CM': 900}
+
+def roman_to_int(s):
+    #Converts a Roman numeral string to an integer.
+    s = s.upper()
+    num = 0
+    for i in range(len(s)):
+        if i > 0 and ROMAN_MAP[s[i]] > ROMAN_MAP[s[i-1]]:
+            num += ROMAN_MAP[s[i]] - 2 * ROMAN_MAP[s[i-1]]
+        else:
+            num += ROMAN_MAP[s[i]]
+    return num
+
+def int_to_roman(num):
+    #Converts a positive integer to a Roman numeral string.
+    result = ""
+    for symbol, value in sorted(ROMAN_SUBTRACTIVE.items(), key=lambda item: -item[1]):
+        count, num = divmod(num, value)
+        result += symbol * count
+    return result
+
+def chapter_number(chapter_id):
+    #Returns the chapter number for ids like "Chapter XIV", "Chapter_14" or "14", None if it can't be parsed.
+    if chapter_id is None:
+        return None
+    match = re.search(r'(\d+)\s*$', str(chapter_id))
+    if match:
+        return int(match.group(1))
+    match = re.search(r'\b([IVXLCDM]+)\.?\s*$', str(chapter_id))
+    if match:
+        return roman_to_int(match.group(1))
+    return None
@@ -0,0 +1,206 @@
+"""Shared Neo4j / Pinecone clients with pool sizing, retries and pool metrics.
+
+Every backend call goes through a `BackendPool`, which bounds concurrency to
+the configured pool size (so callers queue for a slot instead of churning
+connections), retries idempotent calls with jittered exponential backoff and
+records in-use slots, wait time and retries. Neo4j work runs as managed
+transactions, which the driver itself retries.
+"""
+import functools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.config import settings
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# stderr, never stdout: the MCP server speaks JSON-RPC over stdout
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(TimeoutError):
+    """No pool slot became free within the acquisition timeout (not retried)."""
+
+
+def is_retryable(exc):
+    #Transient errors only: connection problems, Neo4j retryable errors, HTTP 429/5xx from Pinecone
+    if isinstance(exc, PoolTimeoutError):
+        return False
+    if hasattr(exc, "is_retryable"):
+        return exc.is_retryable()
+    if getattr(exc, "status", None) in RETRYABLE_STATUS:
+        return True
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        from urllib3.exceptions import HTTPError
+    except ImportError:
+        return False
+    return isinstance(exc, HTTPError)
+
+
+class BackendPool:
+    """Bounded pool of slots for one backend, with retry policy and metrics."""
+
+    def __init__(self, name, size, acquire_timeout, max_retries=settings.CLIENT_MAX_RETRIES,
+                 backoff_base=settings.CLIENT_BACKOFF_BASE, backoff_max=settings.CLIENT_BACKOFF_MAX):
+        self.name = name
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._metrics = {
+            "calls": 0, "in_use": 0, "max_in_use": 0, "retries": 0, "failures": 0,
+            "acquire_timeouts": 0, "wait_time_total_s": 0.0, "wait_time_max_s": 0.0,
+        }
+
+    @contextmanager
+    def slot(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self._record(acquire_timeouts=1)
+            raise PoolTimeoutError(f"Timed out after {self.acquire_timeout}s waiting for a {self.name} connection")
+        waited = time.perf_counter() - start
+        with self._lock:
+            m = self._metrics
+            m["calls"] += 1
+            m["in_use"] += 1
+            m["max_in_use"] = max(m["max_in_use"], m["in_use"])
+            m["wait_time_total_s"] += waited
+            m["wait_time_max_s"] = max(m["wait_time_max_s"], waited)
+        try:
+            yield
+        finally:
+            self._record(in_use=-1)
+            self._slots.release()
+
+    def call(self, fn, *args, idempotent=True, **kwargs):
+        #Run fn in a pool slot; idempotent calls are retried on transient errors
+        attempt = 0
+        while True:
+            try:
+                with self.slot():
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                if not idempotent or attempt >= self.max_retries or not is_retryable(e):
+                    self._record(failures=1)
+                    raise
+                attempt += 1
+                self.record_retry()
+                # full jitter: spreads out retries from concurrent callers
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                logger.warning(
+                    "%s: %s (%s), retry %d/%d in %.2fs", self.name, type(e).__name__, e, attempt, self.max_retries, delay
+                )
+                time.sleep(delay)
+
+    def record_retry(self):
+        #For retries done outside call(), e.g. by the Neo4j driver inside a managed transaction
+        self._record(retries=1)
+
+    def _record(self, **deltas):
+        with self._lock:
+            for key, delta in deltas.items():
+                self._metrics[key] += delta
+
+    def metrics(self):
+        with self._lock:
+            snapshot = dict(self._metrics)
+        snapshot["size"] = self.size
+        snapshot["wait_time_avg_s"] = snapshot["wait_time_total_s"] / snapshot["calls"] if snapshot["calls"] else 0.0
+        return snapshot
+
+
+neo4j_pool = BackendPool("neo4j", settings.NEO4J_MAX_POOL_SIZE, settings.NEO4J_ACQUISITION_TIMEOUT)
+pinecone_pool = BackendPool("pinecone", settings.PINECONE_POOL_SIZE, settings.PINECONE_ACQUISITION_TIMEOUT)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def pool_metrics():
+    return {"neo4j": neo4j_pool.metrics(), "pinecone": pinecone_pool.metrics()}
+
+
+#Neo4j
+def create_neo4j_driver(uri=None, user=None, password=None):
+    #New driver with the pool/timeout settings; the caller owns it and must close it
+    from neo4j import GraphDatabase
+
+    return GraphDatabase.driver(
+        uri or settings.NEO4J_URI,
+        auth=(user or settings.NEO4J_USER, password or settings.NEO4J_PASSWORD),
+        max_connection_pool_size=settings.NEO4J_MAX_POOL_SIZE,
+        connection_acquisition_timeout=settings.NEO4J_ACQUISITION_TIMEOUT,
+        connection_timeout=settings.NEO4J_CONNECTION_TIMEOUT,
+        max_connection_lifetime=settings.NEO4J_MAX_CONNECTION_LIFETIME,
+        max_transaction_retry_time=settings.NEO4J_MAX_TRANSACTION_RETRY_TIME,
+        keep_alive=settings.NEO4J_KEEP_ALIVE,
+    )
+
+def get_neo4j_driver():
+    #Process-wide driver, created on first use
+    with _clients_lock:
+        if "neo4j" not in _clients:
+            _clients["neo4j"] = create_neo4j_driver()
+        return _clients["neo4j"]
+
+def run_neo4j_transaction(driver, work, *args, write=False, **kwargs):
+    #Managed transaction in a pool slot. The driver already retries transient errors for up to
+    #NEO4J_MAX_TRANSACTION_RETRY_TIME, so the pool doesn't add a second retry layer on top,
+    #it only counts the driver's retries (every run of the work after the first one).
+    from neo4j import READ_ACCESS, WRITE_ACCESS
+
+    attempts = 0
+    @functools.wraps(work)  # keeps the timeout/metadata set by @unit_of_work
+    def _counted(tx, *args, **kwargs):
+        nonlocal attempts
+        attempts += 1
+        if attempts > 1:
+            neo4j_pool.record_retry()
+            logger.warning("neo4j: transaction retried by the driver (attempt %d)", attempts)
+        return work(tx, *args, **kwargs)
+
+    def _run():
+        with driver.session(default_access_mode=WRITE_ACCESS if write else READ_ACCESS) as session:
+            execute = session.execute_write if write else session.execute_read
+            return execute(_counted, *args, **kwargs)
+    return neo4j_pool.call(_run, idempotent=False)
+
+def read_cypher(query, params=None):
+    #Run a query in a read transaction on the shared driver (the server rejects writes) and return the records as dicts.
+    #The server aborts it after NEO4J_QUERY_TIMEOUT, so a slow LLM-written query can't hold its pool slot forever
+    from neo4j import unit_of_work
+
+    @unit_of_work(timeout=settings.NEO4J_QUERY_TIMEOUT)
+    def _read(tx):
+        return [record.data() for record in tx.run(query, params or {})]
+    return run_neo4j_transaction(get_neo4j_driver(), _read)
+
+
+#Pinecone
+def get_pinecone():
+    with _clients_lock:
+        if "pinecone" not in _clients:
+            from pinecone import Pinecone
+            _clients["pinecone"] = Pinecone(api_key=settings.PINECONE_API_KEY, pool_threads=settings.PINECONE_POOL_SIZE)
+        return _clients["pinecone"]
+
+def get_pinecone_index(name=None):
+    name = name or settings.PINECONE_INDEX_NAME
+    pc = get_pinecone()
+    with _clients_lock:
+        key = f"pinecone_index:{name}"
+        if key not in _clients:
+            _clients[key] = pc.Index(
+                name,
+                pool_threads=settings.PINECONE_POOL_SIZE,
+                connection_pool_maxsize=settings.PINECONE_POOL_SIZE,
+            )
+        return _clients[key]
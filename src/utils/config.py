@@ -14,9 +14,31 @@ class Settings:
     NEO4J_PASSWORD: str = os.getenv("NEO4J_PASSWORD")
     NEO4J_URI: str = os.getenv("NEO4J_URI")
     NEO4J_USER: str = os.getenv("NEO4J_USER")
+    NEO4J_MAX_POOL_SIZE: int = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+    NEO4J_ACQUISITION_TIMEOUT: float = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "30"))
+    NEO4J_CONNECTION_TIMEOUT: float = float(os.getenv("NEO4J_CONNECTION_TIMEOUT", "15"))
+    NEO4J_MAX_CONNECTION_LIFETIME: float = float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))
+    NEO4J_MAX_TRANSACTION_RETRY_TIME: float = float(os.getenv("NEO4J_MAX_TRANSACTION_RETRY_TIME", "30"))
+    NEO4J_KEEP_ALIVE: bool = os.getenv("NEO4J_KEEP_ALIVE", "true").lower() == "true"
+    NEO4J_QUERY_TIMEOUT: float = float(os.getenv("NEO4J_QUERY_TIMEOUT", "30"))
 
     PINECONE_API_KEY: str = os.getenv("PINECONE_API_KEY")
     PINECONE_INDEX_NAME: str = os.getenv("PINECONE_INDEX_NAME")
+    PINECONE_POOL_SIZE: int = int(os.getenv("PINECONE_POOL_SIZE", "10"))
+    PINECONE_ACQUISITION_TIMEOUT: float = float(os.getenv("PINECONE_ACQUISITION_TIMEOUT", "30"))
+    PINECONE_REQUEST_TIMEOUT: float = float(os.getenv("PINECONE_REQUEST_TIMEOUT", "30"))
+
+    #retries of idempotent backend calls (jittered exponential backoff, seconds)
+    CLIENT_MAX_RETRIES: int = int(os.getenv("CLIENT_MAX_RETRIES", "3"))
+    CLIENT_BACKOFF_BASE: float = float(os.getenv("CLIENT_BACKOFF_BASE", "0.5"))
+    CLIENT_BACKOFF_MAX: float = float(os.getenv("CLIENT_BACKOFF_MAX", "8"))
+
+    #embeddings: EMBEDDING_REDUCTION is one of none | matryoshka | pca
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "models/gemini-embedding-001")
+    EMBEDDING_FULL_DIM: int = 3072
+    EMBEDDING_DIM: int = int(os.getenv("EMBEDDING_DIM", "3072"))
+    EMBEDDING_REDUCTION: str = os.getenv("EMBEDDING_REDUCTION", "none")
+
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL")
     
@@ -43,6 +65,9 @@ class Paths:
     PRE_PROCESSED_DIR = DATA_DIR / "pre_processed"
     PROCESSED_F_DIR = PROCESSED_DIR / "processed_book.json"
     PROCESSED_T_DIR = PROCESSED_DIR / "results.json"
+    EMBEDDINGS_CACHE_DIR = PROCESSED_DIR / "scene_embeddings.npz"
+    PCA_PROJECTION_DIR = PROCESSED_DIR / "pca_projection.npz"
+    PIPELINE_MANIFEST_DIR = PROCESSED_DIR / "pipeline_manifest.json"
 
     #crew
     CREW_DIR = BASE_DIR/"app_crewai"
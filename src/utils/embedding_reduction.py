@@ -0,0 +1,130 @@
+from pathlib import Path
+
+import numpy as np
+
+from utils.config import paths, settings
+
+REDUCTION_METHODS = ("none", "matryoshka", "pca")
+
+
+def _normalize(vectors):
+    #L2-normalize each row so cosine scores stay comparable after reduction
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class EmbeddingReducer:
+    """Maps full-width embeddings to the width stored in the Pinecone index.
+
+    - "none": vectors are returned unchanged.
+    - "matryoshka": keeps the first `dim` components and re-normalizes
+      (gemini-embedding-001 is trained so that prefixes remain usable).
+    - "pca": projects onto the top `dim` principal components fitted on the corpus.
+    """
+
+    def __init__(self, method="none", dim=settings.EMBEDDING_FULL_DIM):
+        if method not in REDUCTION_METHODS:
+            raise ValueError(f"Unknown reduction method '{method}', expected one of {REDUCTION_METHODS}")
+        if method != "none" and not 0 < dim <= settings.EMBEDDING_FULL_DIM:
+            raise ValueError(f"Reduced dimension must be between 1 and {settings.EMBEDDING_FULL_DIM}, got {dim}")
+        self.method = method
+        self.dim = dim if method != "none" else settings.EMBEDDING_FULL_DIM
+        self.mean = None
+        self.components = None
+
+    @classmethod
+    def from_settings(cls):
+        #Build the reducer configured in .env, loading the fitted PCA projection if needed
+        reducer = cls(settings.EMBEDDING_REDUCTION, settings.EMBEDDING_DIM)
+        if reducer.method == "pca":
+            reducer.load(paths.PCA_PROJECTION_DIR)
+        return reducer
+
+    @property
+    def is_fitted(self):
+        return self.method != "pca" or self.components is not None
+
+    def check_corpus_size(self, n_vectors):
+        #After centering, n vectors span at most n-1 dimensions, so PCA needs more vectors than components
+        if self.method == "pca" and self.dim >= n_vectors:
+            raise ValueError(
+                f"PCA to {self.dim} dimensions needs more than {self.dim} vectors, got {n_vectors}"
+            )
+
+    def fit(self, vectors):
+        #Only PCA needs fitting
+        if self.method != "pca":
+            return self
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.check_corpus_size(vectors.shape[0])
+        self.mean = vectors.mean(axis=0)
+        _, _, vt = np.linalg.svd(vectors - self.mean, full_matrices=False)
+        self.components = vt[:self.dim]
+        return self
+
+    def transform(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.method == "none":
+            return vectors
+        if self.method == "matryoshka":
+            return _normalize(vectors[:, :self.dim])
+        if not self.is_fitted:
+            raise RuntimeError("PCA projection is not fitted; run vector_db_loader first")
+        return _normalize((vectors - self.mean) @ self.components.T)
+
+    def fit_transform(self, vectors):
+        return self.fit(vectors).transform(vectors)
+
+    def transform_one(self, vector):
+        #Convenience for query vectors: list in, list out
+        return self.transform([vector])[0].tolist()
+
+    def save(self, path):
+        if self.method == "pca":
+            np.savez(Path(path), mean=self.mean, components=self.components)
+            print(f"PCA projection saved to {path}")
+
+    def load(self, path):
+        try:
+            data = np.load(Path(path))
+        except FileNotFoundError:
+            raise FileNotFoundError(f"PCA projection not found at {path}; run vector_db_loader first") from None
+        self.mean = data["mean"]
+        self.components = data["components"]
+        if self.components.shape[0] != self.dim:
+            raise ValueError(
+                f"PCA projection at {path} has {self.components.shape[0]} components, EMBEDDING_DIM is {self.dim}"
+            )
+        return self
+
+
+#Quantization
+def quantize_int8(vectors):
+    #Symmetric per-vector int8 quantization, returns the codes and one float scale per vector
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1, keepdims=True) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.round(vectors / scales), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def dequantize_int8(codes, scales):
+    return codes.astype(np.float32) * scales
+
+def quantize_binary(vectors):
+    #1 bit per component (sign), packed into bytes
+    return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+def unpack_binary(packed, dim):
+    #Back to a +1/-1 matrix, so a dot product ranks like the Hamming distance
+    bits = np.unpackbits(packed, axis=1)[:, :dim].astype(np.float32)
+    return bits * 2.0 - 1.0
+
+def bytes_per_vector(dim, quantization="float32"):
+    if quantization == "float32":
+        return dim * 4
+    if quantization == "int8":
+        return dim + 4  # codes + float32 scale
+    if quantization == "binary":
+        return (dim + 7) // 8
+    raise ValueError(f"Unknown quantization '{quantization}'")
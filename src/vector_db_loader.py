@@ -1,6 +1,9 @@
 from utils.config import settings,paths
-from pinecone import Pinecone,ServerlessSpec
+from pinecone import ServerlessSpec
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from utils.embedding_reduction import EmbeddingReducer
+from utils.clients import get_pinecone, get_pinecone_index, pinecone_pool, pool_metrics
+import numpy as np
 import json
 import time
 
@@ -46,15 +49,38 @@ def prepare_documents_for_embedding(all_chapters):
     
     return documents
 
-def main():
-    print(settings.PINECONE_INDEX_NAME)
-    pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-    print("Pinecone connection established",sep="\n")
-    #verify if the index exists
-    if settings.PINECONE_INDEX_NAME not in pc.list_indexes().names():
-        pc.create_index(
+def embed_documents(documents, embeddings, batch_size=50):
+    #Create full-width embeddings in batches
+    all_embeddings = []
+    for i in range(0, len(documents), batch_size):
+        batch_texts = [doc['text'] for doc in documents[i:i + batch_size]]
+        print(f"  - Embedding batch {i//batch_size + 1}...")
+        all_embeddings.extend(embeddings.embed_documents(batch_texts))
+        time.sleep(1)
+    return np.asarray(all_embeddings, dtype=np.float32)
+
+def save_embedding_cache(documents, vectors):
+    #Cache the full-width vectors so reductions can be refitted without calling the API again
+    np.savez(paths.EMBEDDINGS_CACHE_DIR, ids=np.array([str(doc['id']) for doc in documents]), vectors=vectors)
+    print(f"Embeddings cached to {paths.EMBEDDINGS_CACHE_DIR}")
+
+def load_embedding_cache():
+    #Returns (ids, vectors), or (None, None) if the cache doesn't exist yet
+    try:
+        cache = np.load(paths.EMBEDDINGS_CACHE_DIR)
+    except FileNotFoundError:
+        return None, None
+    return list(cache["ids"]), cache["vectors"]
+
+def get_index(dimension):
+    #Create the index if needed and check its dimension matches the configured embedding width
+    pc = get_pinecone()
+    if settings.PINECONE_INDEX_NAME not in pinecone_pool.call(pc.list_indexes).names():
+        pinecone_pool.call(
+            pc.create_index,
+            idempotent=False,
             name=settings.PINECONE_INDEX_NAME,
-            dimension=3072,
+            dimension=dimension,
             metric='cosine',
             spec=ServerlessSpec(
                 cloud='aws',
@@ -63,45 +89,65 @@ def main():
         )
         print(f"Index {settings.PINECONE_INDEX_NAME} created.",sep="\n")
     else:
+        index_dim = pinecone_pool.call(pc.describe_index, settings.PINECONE_INDEX_NAME).dimension
+        if index_dim != dimension:
+            raise ValueError(
+                f"Index '{settings.PINECONE_INDEX_NAME}' has dimension {index_dim} but EMBEDDING_DIM is {dimension}; "
+                "use another PINECONE_INDEX_NAME or delete the index."
+            )
         print(f"Index found... loading...",sep="\n")
+    return get_pinecone_index(settings.PINECONE_INDEX_NAME)
 
-    #Load the index
-    index = pc.Index(settings.PINECONE_INDEX_NAME)
-    #Load the extracted document
-    document = load_all_extractions(paths.PROCESSED_F_DIR,True)
-    #Prepare the document for pinecone
-    documents = prepare_documents_for_embedding(document)
-
-    # Embedding model
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001", google_api_key=settings.GOOGLE_API_KEY)
-    batch_size = 50 
-    print(f"Starting to create embeddings and upsert to Pinecone in batches of {batch_size}...")
-    
+def upsert_documents(index, documents, vectors, batch_size=50):
+    print(f"Upserting to Pinecone in batches of {batch_size}...")
     for i in range(0, len(documents), batch_size):
         batch = documents[i:i + batch_size]
-        batch_texts = [doc['text'] for doc in batch]
-        
-        print(f"  - Processing batch {i//batch_size + 1}...")
-        
-        # Create embeddings for the batch of texts
-        batch_embeddings = embeddings.embed_documents(batch_texts)
         
         # Prepare the data for upsert in the format Pinecone expects
         vectors_to_upsert = []
         for j, doc in enumerate(batch):
             vectors_to_upsert.append({
                 "id": doc['id'],
-                "values": batch_embeddings[j],
+                "values": vectors[i + j].tolist(),
                 "metadata": doc['metadata']
             })
         
-        # Upsert the batch to Pinecone
-        index.upsert(vectors=vectors_to_upsert)
+        # Upsert the batch to Pinecone (idempotent by id, so safe to retry)
+        pinecone_pool.call(index.upsert, vectors=vectors_to_upsert, _request_timeout=settings.PINECONE_REQUEST_TIMEOUT)
         print(f"  - Batch {i//batch_size + 1} successfully upserted.")
-        time.sleep(1)
+
+def main():
+    print(settings.PINECONE_INDEX_NAME)
+    reducer = EmbeddingReducer(settings.EMBEDDING_REDUCTION, settings.EMBEDDING_DIM)
+    print(f"Embedding reduction: {reducer.method} ({reducer.dim} dimensions)")
+
+    #Load the extracted document
+    document = load_all_extractions(paths.PROCESSED_F_DIR,True)
+    #Prepare the document for pinecone
+    documents = prepare_documents_for_embedding(document)
+    # Fail before creating the index if the corpus is too small for the PCA width
+    reducer.check_corpus_size(len(documents))
+
+    #Load the index (created if it doesn't exist)
+    index = get_index(reducer.dim)
+    print("Pinecone connection established",sep="\n")
+
+    # Embedding model
+    embeddings = GoogleGenerativeAIEmbeddings(model=settings.EMBEDDING_MODEL, google_api_key=settings.GOOGLE_API_KEY)
+    batch_size = 50 
+    print(f"Starting to create embeddings in batches of {batch_size}...")
+    full_vectors = embed_documents(documents, embeddings, batch_size)
+    save_embedding_cache(documents, full_vectors)
+
+    # Reduce to the index width (PCA is fitted on this corpus and saved for the MCP server)
+    vectors = reducer.fit_transform(full_vectors)
+    reducer.save(paths.PCA_PROJECTION_DIR)
+
+    upsert_documents(index, documents, vectors, batch_size)
 
     print(f"\nLoading complete!")
     print(f"{len(documents)} vectors were upserted to index '{settings.PINECONE_INDEX_NAME}'.")
+    print(f"Pinecone pool metrics: {json.dumps(pool_metrics()['pinecone'])}")
 
 
 #main()
\ No newline at end of file